@@ -1496,6 +1496,7 @@ def checkplot_pickle_update(
         outfile=None,
         outgzip=False,
         pickleprotocol=None,
+        pickleoptimize=False,
         verbose=True
 ):
     '''This updates the current checkplotdict with updated values provided.
@@ -1541,6 +1542,11 @@ def checkplot_pickle_update(
         use. Note that this will make pickles generated by Py3 incompatible with
         Py2.
 
+    pickleoptimize : bool
+        If this is True, will run the output pickle stream through
+        `pickletools.optimize` before writing it. This makes the pickle smaller
+        and a bit faster to load at the cost of a slower write.
+
     verbose : bool
         If True, will indicate progress and warn about problems.
 
@@ -1607,4 +1613,5 @@ def checkplot_pickle_update(
     return _write_checkplot_picklefile(cp_current,
                                        outfile=plotfpath,
                                        outgzip=outgzip,
-                                       protocol=pickleprotocol)
+                                       protocol=pickleprotocol,
+                                       optimize=pickleoptimize)
@@ -42,10 +42,19 @@ LOGEXCEPTION = LOGGER.exception
 
 import os
 import os.path
+import stat
+import binascii
 import gzip
-import base64
+import mmap
+# pybase64 is a faster, drop-in replacement for base64. the other checkplot and
+# checkplotserver modules import base64 from here so they all use the same one
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
 
 import pickle
+import pickletools
 from io import BytesIO as StrIO
 
 from tornado.escape import squeeze
@@ -115,10 +124,108 @@ def _base64_to_file(b64str, outfpath, writetostrio=False):
         return None
 
 
+#######################
+## ATOMIC FILE WRITES ##
+#######################
+
+def _write_file_atomic(outfile, writefunc):
+    '''This writes a file by writing to a temporary file and renaming it.
+
+    The temporary file is in the same directory as `outfile`, so the rename is
+    atomic. Anything reading `outfile` at the same time will see either the old
+    or the new version, never a partial one. If `writefunc` raises, the
+    temporary file is removed and `outfile` is left as it was.
+
+    Parameters
+    ----------
+
+    outfile : str
+        The path to the output file.
+
+    writefunc : Python function
+        A function that takes a single argument: the file object of the
+        temporary file, opened in binary write mode. This should write the
+        contents of the output file to it.
+
+    Returns
+    -------
+
+    str
+        The absolute path to the written file.
+
+    '''
+
+    outfile = os.path.abspath(outfile)
+    outdir, outfname = os.path.split(outfile)
+    temppath = os.path.join(
+        outdir,
+        '.%s-%s.tmp' % (outfname, binascii.hexlify(os.urandom(6)).decode())
+    )
+
+    # os.open is used instead of tempfile.mkstemp so new files get the usual
+    # permissions for the current umask instead of 0600
+    tempfd = os.open(temppath, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+
+    try:
+
+        with os.fdopen(tempfd,'wb') as outfd:
+            writefunc(outfd)
+
+        # keep the permissions of the file we're replacing if there is one
+        if os.path.exists(outfile):
+            os.chmod(temppath, stat.S_IMODE(os.stat(outfile).st_mode))
+
+        os.replace(temppath, outfile)
+
+    except BaseException:
+
+        if os.path.exists(temppath):
+            os.remove(temppath)
+        raise
+
+    return outfile
+
+
 ########################
 ## READ/WRITE PICKLES ##
 ########################
 
+def _load_mmapped_pickle(picklefile, **loadkwargs):
+    '''This unpickles a (gzipped) pickle file via a read-only memory map.
+
+    An empty file can't be memory-mapped, so this raises a `ValueError` for a
+    zero-byte file instead of the `EOFError` that `pickle.load` would raise.
+
+    Parameters
+    ----------
+
+    picklefile : str
+        The path to the pickle file to load. Gzipped files are detected using
+        their magic bytes.
+
+    loadkwargs : additional keyword arguments
+        These are passed through to `pickle.load`.
+
+    Returns
+    -------
+
+    object
+        The unpickled object.
+
+    '''
+
+    with open(picklefile,'rb') as infd:
+
+        with mmap.mmap(infd.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+
+            if mm[:2] == b'\x1f\x8b':
+                with gzip.GzipFile(fileobj=mm, mode='rb') as gzfd:
+                    return pickle.load(gzfd, **loadkwargs)
+
+            else:
+                return pickle.load(mm, **loadkwargs)
+
+
 def _read_checkplot_picklefile(checkplotpickle):
     '''This reads a checkplot gzipped pickle file back into a dict.
 
@@ -135,8 +242,8 @@ def _read_checkplot_picklefile(checkplotpickle):
     ----------
 
     checkplotpickle : str
-        The path to a checkplot pickle file. This can be a gzipped file (in
-        which case the file extension should end in '.gz')
+        The path to a checkplot pickle file. This can be a gzipped file, which
+        is recognized by its magic bytes rather than its file extension.
 
     Returns
     -------
@@ -144,40 +251,56 @@ def _read_checkplot_picklefile(checkplotpickle):
     dict
         This returns a checkplotdict.
 
+    Raises
+    ------
+
+    ValueError
+        If `checkplotpickle` is an empty file, since it can't be
+        memory-mapped.
+
     '''
 
-    if checkplotpickle.endswith('.gz'):
+    # memory-map the file so we don't need to hold a full copy of it in memory
+    # before unpickling. whether it's gzipped is figured out from the magic
+    # bytes, so this works even if the filename doesn't end in '.gz'
+    try:
+        cpdict = _load_mmapped_pickle(checkplotpickle)
 
-        try:
-            with gzip.open(checkplotpickle,'rb') as infd:
-                cpdict = pickle.load(infd)
+    except UnicodeDecodeError:
 
-        except UnicodeDecodeError:
+        cpdict = _load_mmapped_pickle(checkplotpickle, encoding='latin1')
 
-            with gzip.open(checkplotpickle,'rb') as infd:
-                cpdict = pickle.load(infd, encoding='latin1')
+    return cpdict
 
-    else:
 
-        try:
-            with open(checkplotpickle,'rb') as infd:
-                cpdict = pickle.load(infd)
+def _dump_pickle(obj, outfd, protocol, optimize):
+    '''This pickles `obj` to the open file `outfd`.
 
-        except UnicodeDecodeError:
+    If `optimize` is True, the pickle stream is passed through
+    `pickletools.optimize` before it's written.
 
-            with open(checkplotpickle,'rb') as infd:
-                cpdict = pickle.load(infd, encoding='latin1')
+    '''
 
-    return cpdict
+    if optimize:
+        outfd.write(
+            pickletools.optimize(pickle.dumps(obj, protocol=protocol))
+        )
+    else:
+        pickle.dump(obj, outfd, protocol=protocol)
 
 
 def _write_checkplot_picklefile(checkplotdict,
                                 outfile=None,
                                 protocol=None,
-                                outgzip=False):
+                                outgzip=False,
+                                optimize=False):
 
     '''This writes the checkplotdict to a (gzipped) pickle file.
 
+    The pickle is written to a temporary file in the same directory first,
+    which is then renamed to the output file. An existing checkplot pickle is
+    therefore never left half-written if something goes wrong.
+
     Parameters
     ----------
 
@@ -210,6 +333,12 @@ def _write_checkplot_picklefile(checkplotdict,
         If this is True, will gzip the output file. Note that if the `outfile`
         str ends in a gzip, this will be automatically turned on.
 
+    optimize : bool
+        If this is True, will run the pickle stream through
+        `pickletools.optimize` before writing it out. This removes unused PUT
+        opcodes, making the pickle smaller and a bit faster to load, at the cost
+        of holding the full pickle in memory while writing it.
+
     Returns
     -------
 
@@ -223,40 +352,32 @@ def _write_checkplot_picklefile(checkplotdict,
     if not protocol:
         protocol = 4
 
-    if outgzip:
-
-        if not outfile:
-
-            outfile = (
-                'checkplot-{objectid}.pkl.gz'.format(
-                    objectid=squeeze(checkplotdict['objectid']).replace(' ','-')
-                )
-            )
-
-        with gzip.open(outfile,'wb') as outfd:
-            pickle.dump(checkplotdict,outfd,protocol=protocol)
-
-    else:
+    if not outfile:
 
-        if not outfile:
-
-            outfile = (
-                'checkplot-{objectid}.pkl'.format(
-                    objectid=squeeze(checkplotdict['objectid']).replace(' ','-')
-                )
+        outfile = (
+            'checkplot-{objectid}.pkl{gzext}'.format(
+                objectid=squeeze(checkplotdict['objectid']).replace(' ','-'),
+                gzext='.gz' if outgzip else ''
             )
-
-        # make sure to do the right thing if '.gz' is in the filename but
-        # outgzip was False
-        if outfile.endswith('.gz'):
-
-            LOGWARNING('output filename ends with .gz but kwarg outgzip=False. '
-                       'will use gzip to compress the output pickle')
-            with gzip.open(outfile,'wb') as outfd:
-                pickle.dump(checkplotdict,outfd,protocol=protocol)
-
+        )
+
+    # make sure to do the right thing if '.gz' is in the filename but
+    # outgzip was False
+    if not outgzip and outfile.endswith('.gz'):
+
+        LOGWARNING('output filename ends with .gz but kwarg outgzip=False. '
+                   'will use gzip to compress the output pickle')
+        outgzip = True
+
+    def _write_pickle(rawfd):
+        if outgzip:
+            with gzip.GzipFile(filename=os.path.basename(outfile),
+                               mode='wb',
+                               fileobj=rawfd) as outfd:
+                _dump_pickle(checkplotdict, outfd, protocol, optimize)
         else:
-            with open(outfile,'wb') as outfd:
-                pickle.dump(checkplotdict,outfd,protocol=protocol)
+            _dump_pickle(checkplotdict, rawfd, protocol, optimize)
 
-    return os.path.abspath(outfile)
+    # this writes to a temporary file in the same directory, then renames it
+    # to the actual output file
+    return _write_file_atomic(outfile, _write_pickle)
@@ -41,7 +41,6 @@ LOGEXCEPTION = LOGGER.exception
 import os
 import os.path
 import gzip
-import base64
 import json
 import re
 
@@ -81,6 +80,8 @@ from astropy.wcs import WCS
 ## LOCAL IMPORTS ##
 ###################
 
+from .pkl_io import base64
+
 from ..lcmath import phase_magseries, phase_bin_magseries
 from ..lcfit.nonphysical import spline_fit_magseries, savgol_fit_magseries
 
@@ -1387,7 +1388,9 @@ def _pkl_magseries_plot(stimes, smags, serrs,
                                    magnitude/flux time-series plot,
                            'times': the `stimes` array,
                            'mags': the `smags` array,
-                           'errs': the 'serrs' array}}
+                           'errs': the 'serrs' array,
+                           'ndet': the number of points in `stimes`,
+                           'time0': the earliest time in `stimes`}}
 
         The dict is returned in this format so it can be directly incorporated
         in a checkplotdict, using Python's dict `update()` method.
@@ -1456,7 +1459,11 @@ def _pkl_magseries_plot(stimes, smags, serrs,
             'plot':magseriesb64,
             'times':stimes,
             'mags':smags,
-            'errs':serrs
+            'errs':serrs,
+            # these are stored separately so checkplotserver doesn't need to
+            # go through the arrays every time it loads this checkplot
+            'ndet':int(stimes.size),
+            'time0':float(npmin(stimes)),
         }
     }
 
@@ -26,7 +26,7 @@ import stat
 
 # this handles async updates of the checkplot pickles so the UI remains
 # responsive
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 
 # setup signal trapping on SIGINT
@@ -105,6 +105,19 @@ define('maxprocs',
              'for saving/loading checkplot files and '
              'running light curves tools'),
        type=int)
+define('cachesize',
+       default=16,
+       help=('Number of recently viewed checkplots to keep in memory '
+             'so they load faster when revisited. '
+             'Set this to 0 to turn off caching, except for the last '
+             'checkplot whose plots were requested.'),
+       type=int)
+define('pickleprotocol',
+       default=4,
+       help=('The pickle protocol to use when saving changes to checkplots. '
+             'Protocol 5 is faster for large checkplots, but can only be '
+             'read by Python 3.8 and later.'),
+       type=int)
 define('readonly',
        default=False,
        help=("Run the server in readonly mode. This is useful for a "
@@ -175,6 +188,11 @@ def main():
                                          /cpserver1/, /cpserver2/, etc. If this is
                                          set, all URLs will take the form
                                          [baseurl]/..., instead of /... (default /)
+        --cachesize                      Number of recently viewed checkplots to
+                                         keep in memory so they load faster when
+                                         revisited. Set this to 0 to turn off
+                                         caching, except for the last checkplot
+                                         whose plots were requested. (default 16)
         --checkplotlist                  The path to the checkplot-filelist.json file
                                          listing checkplots to load and serve. If
                                          this is not provided, checkplotserver will
@@ -185,6 +203,11 @@ def main():
         --maxprocs                       Number of background processes to use for
                                          saving/loading checkplot files and running
                                          light curves tools (default 2)
+        --pickleprotocol                 The pickle protocol to use when saving
+                                         changes to checkplots. Protocol 5 is
+                                         faster for large checkplots, but can only
+                                         be read by Python 3.8 and later.
+                                         (default 4)
         --port                           Run on the given port. (default 5225)
         --readonly                       Run the server in readonly mode. This is
                                          useful for a public-facing instance of
@@ -226,6 +249,30 @@ def main():
 
     EXECUTOR = ProcessPoolExecutor(MAXPROCS)
 
+    # this is used for reading checkplot pickles. these end up in the main
+    # process anyway, so doing them in a thread avoids pickling the entire
+    # checkplot dict to send it back from a worker process. the CPU-bound LC
+    # tools stay on the process pool above.
+    IO_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+
+    # this writes the checkplot list JSON. it only has one worker so that
+    # concurrent updates to the list are written out in the order they came in
+    CPLIST_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+
+    ####################################
+    ## IN-MEMORY CHECKPLOT DICT CACHE ##
+    ####################################
+
+    CPCACHE = basehandlers.CheckplotCache(maxsize=options.cachesize)
+
+    # the image endpoint gets a request for every plot in a checkplot when it's
+    # viewed, so it always keeps at least the last checkplot around, even if
+    # caching is otherwise turned off
+    if options.cachesize > 0:
+        IMGCACHE = CPCACHE
+    else:
+        IMGCACHE = basehandlers.CheckplotCache(maxsize=1)
+
     #######################################
     ## CHECK IF WE'RE IN STANDALONE MODE ##
     #######################################
@@ -357,6 +404,16 @@ def main():
                 LOGGER.error(helpmsg)
                 sys.exit(1)
 
+        # all checkplot paths in the list file are relative to this directory
+        CPDIR = os.path.abspath(os.path.dirname(cplistfile))
+
+        # this is used by the handlers to quickly check if a requested
+        # checkplot is in the current project
+        CPSET = frozenset(CHECKPLOTLIST['checkplots'])
+
+        # this holds the encoded JSON of the checkplot list between changes
+        CPLISTCACHE = basehandlers.ProjectJSONCache()
+
         ##################################
         ## URL HANDLERS FOR NORMAL MODE ##
         ##################################
@@ -380,7 +437,26 @@ def main():
               'cplist':CHECKPLOTLIST,
               'cplistfile':cplistfile,
               'executor':EXECUTOR,
-              'readonly':READONLY}),
+              'readonly':READONLY,
+              'cpcache':CPCACHE,
+              'cpdir':CPDIR,
+              'cpset':CPSET,
+              'baseurl':BASEURL,
+              'ioexecutor':IO_EXECUTOR,
+              'pickleprotocol':options.pickleprotocol}),
+            # serves the plots in checkplot pickles as PNG images
+            (r'{baseurl}img/([^/]+)/([^/]+)'.format(baseurl=BASEURL),
+             cphandlers.CheckplotImageHandler,
+             {'currentdir':CURRENTDIR,
+              'assetpath':ASSETPATH,
+              'cplist':CHECKPLOTLIST,
+              'cplistfile':cplistfile,
+              'executor':EXECUTOR,
+              'readonly':READONLY,
+              'cpcache':IMGCACHE,
+              'cpdir':CPDIR,
+              'cpset':CPSET,
+              'ioexecutor':IO_EXECUTOR}),
             # loads and interacts with the current checkplot list JSON file
             (r'{baseurl}list'.format(baseurl=BASEURL),
              cphandlers.CheckplotListHandler,
@@ -389,7 +465,9 @@ def main():
               'cplist':CHECKPLOTLIST,
               'cplistfile':cplistfile,
               'executor':EXECUTOR,
-              'readonly':READONLY}),
+              'readonly':READONLY,
+              'cplistexecutor':CPLIST_EXECUTOR,
+              'cplistcache':CPLISTCACHE}),
             # light curve variability and period-finding tool endpoints
             (r'{baseurl}tools/?(.*)'.format(baseurl=BASEURL),
              toolhandlers.LCToolHandler,
@@ -398,7 +476,11 @@ def main():
               'cplist':CHECKPLOTLIST,
               'cplistfile':cplistfile,
               'executor':EXECUTOR,
-              'readonly':READONLY}),
+              'readonly':READONLY,
+              'cpcache':CPCACHE,
+              'cpdir':CPDIR,
+              'cpset':CPSET,
+              'ioexecutor':IO_EXECUTOR}),
             # download any file in the current base directory, mostly used for
             # downloading checkplot pickles and updated checkplot list JSONs
             (r'{baseurl}download/(.*)'.format(baseurl=BASEURL),
@@ -414,6 +496,10 @@ def main():
         static_path=ASSETPATH,
         template_path=ASSETPATH,
         static_url_prefix='{baseurl}static/'.format(baseurl=BASEURL),
+        # this gzips the JSON responses (which still carry some base64 encoded
+        # plots) and adds a 'Vary: Accept-Encoding' header to them. the PNGs
+        # from the image endpoint are already compressed, and tornado doesn't
+        # try to compress image/png responses
         compress_response=True,
         debug=DEBUG,
     )
@@ -464,6 +550,8 @@ def main():
         # close down the processpool
 
     EXECUTOR.shutdown()
+    IO_EXECUTOR.shutdown()
+    CPLIST_EXECUTOR.shutdown()
     time.sleep(3)
 
 
@@ -14,9 +14,13 @@ These are Tornado handlers for serving checkplots and operating on them.
 
 import os
 import os.path
-import base64
 import logging
 import time as utime
+# fcntl is only available on Unix-like systems
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 from io import BytesIO as StrIO
 
 import numpy as np
@@ -44,23 +48,99 @@ LOGGER = logging.getLogger(__name__)
 import tornado.ioloop
 import tornado.httpserver
 import tornado.web
-from tornado.escape import xhtml_escape, url_unescape
+from tornado.escape import xhtml_escape, url_escape
 from tornado import gen
 
 ###################
 ## LOCAL IMPORTS ##
 ###################
 
-from ..checkplot.pkl_io import (
-    _read_checkplot_picklefile,
-)
+from ..checkplot.pkl_io import base64, _write_file_atomic
 from ..checkplot.pkl_png import checkplot_pickle_to_png
 from ..checkplot.pkl import checkplot_pickle_update
 
-from .checkplotserver_handlers import PFMETHODS
+from .checkplotserver_handlers import (
+    PFMETHODS,
+    BaseHandler,
+    _stat_or_none,
+    _safe_cpname,
+    _json_loads,
+)
+
+
+def _write_json_atomic(outfile, jsonbytes):
+    '''This writes already encoded JSON bytes to `outfile`.
+
+    This uses `_write_file_atomic`, so `outfile` is never left truncated or
+    half-written if something goes wrong.
+
+    Parameters
+    ----------
+
+    outfile : str
+        The path to the output JSON file.
+
+    jsonbytes : bytes
+        The JSON to write, e.g. from `_json_dumps`. This is encoded by the
+        caller so the object being written can't change while it's written out
+        by a background thread.
+
+    Returns
+    -------
+
+    str
+        The path to the written JSON file.
+
+    '''
+
+    return _write_file_atomic(outfile, lambda outfd: outfd.write(jsonbytes))
+
+
+def _update_checkplot_locked(cpfpath, updated, **kwargs):
+    '''This runs `checkplot_pickle_update` while holding a lock on `cpfpath`.
+
+    The lock is an exclusive `flock` on a hidden `.lock` file next to the
+    checkplot pickle. This keeps two concurrent updates to the same checkplot
+    from reading the same old version and then overwriting each other's
+    changes. The pickle itself is written to a temporary file and renamed into
+    place by `checkplot_pickle_update`, so readers don't need to take the lock.
+    On systems without `fcntl`, this just calls `checkplot_pickle_update`.
+
+    Parameters
+    ----------
 
+    cpfpath : str
+        The path to the checkplot pickle to update.
 
-class CheckplotHandler(tornado.web.RequestHandler):
+    updated : dict
+        The updated checkplot dict items to write to the checkplot pickle.
+
+    kwargs : additional keyword arguments
+        These are passed through to `checkplot_pickle_update`.
+
+    Returns
+    -------
+
+    str
+        The path to the updated checkplot pickle, or None if the update failed.
+
+    '''
+
+    if fcntl is None:
+        return checkplot_pickle_update(cpfpath, updated, **kwargs)
+
+    cpdir, cpfname = os.path.split(os.path.abspath(cpfpath))
+    lockfpath = os.path.join(cpdir, '.%s.lock' % cpfname)
+
+    with open(lockfpath, 'w') as lockfd:
+        fcntl.flock(lockfd, fcntl.LOCK_EX)
+        try:
+            return checkplot_pickle_update(cpfpath, updated, **kwargs)
+        finally:
+            fcntl.flock(lockfd, fcntl.LOCK_UN)
+
+
+class CheckplotHandler(BaseHandler):
     '''This handles loading and saving checkplots.
 
     This includes GET requests to get to and load a specific checkplot pickle
@@ -69,7 +149,8 @@ class CheckplotHandler(tornado.web.RequestHandler):
     '''
 
     def initialize(self, currentdir, assetpath, cplist,
-                   cplistfile, executor, readonly):
+                   cplistfile, executor, readonly, cpcache, baseurl, cpdir,
+                   cpset, ioexecutor, pickleprotocol=4):
         '''
         This handles initial setup of this `RequestHandler`.
 
@@ -80,7 +161,13 @@ class CheckplotHandler(tornado.web.RequestHandler):
         self.currentproject = cplist
         self.cplistfile = cplistfile
         self.executor = executor
+        self.ioexecutor = ioexecutor
         self.readonly = readonly
+        self.cpcache = cpcache
+        self.cpdir = cpdir
+        self.cpset = cpset
+        self.baseurl = baseurl
+        self.pickleprotocol = pickleprotocol
 
     @gen.coroutine
     def get(self, checkplotfname):
@@ -94,22 +181,19 @@ class CheckplotHandler(tornado.web.RequestHandler):
         if checkplotfname:
 
             # do the usual safing
-            self.checkplotfname = xhtml_escape(
-                base64.b64decode(url_unescape(checkplotfname))
-            )
+            self.checkplotfname = _safe_cpname(checkplotfname)
 
             # see if this plot is in the current project
-            if self.checkplotfname in self.currentproject['checkplots']:
+            if self.checkplotfname in self.cpset:
 
                 # make sure this file exists
-                cpfpath = os.path.join(
-                    os.path.abspath(os.path.dirname(self.cplistfile)),
-                    self.checkplotfname
-                )
+                cpfpath = os.path.join(self.cpdir, self.checkplotfname)
 
                 LOGGER.info('loading %s...' % cpfpath)
 
-                if not os.path.exists(cpfpath):
+                cpstat = _stat_or_none(cpfpath)
+
+                if cpstat is None:
 
                     msg = "couldn't find checkplot %s" % cpfpath
                     LOGGER.error(msg)
@@ -117,13 +201,12 @@ class CheckplotHandler(tornado.web.RequestHandler):
                                   'message':msg,
                                   'result':None}
 
-                    self.write(resultdict)
+                    self._write_json(resultdict)
                     raise tornado.web.Finish()
 
-                # this is the async call to the executor
-                cpdict = yield self.executor.submit(
-                    _read_checkplot_picklefile, cpfpath
-                )
+                # this is the async call to the executor if the checkplot isn't
+                # already cached
+                cpdict = yield self._read_checkplot(cpfpath, cpstat.st_mtime)
 
                 #####################################
                 ## continue after we're good to go ##
@@ -131,10 +214,14 @@ class CheckplotHandler(tornado.web.RequestHandler):
 
                 LOGGER.info('loaded %s' % cpfpath)
 
-                # break out the initial info
+                # break out the initial info. cpdict may be the copy held in
+                # the checkplot cache, so objectinfo and varinfo are copied
+                # here before their NaNs and arrays are cleaned up below
                 objectid = cpdict['objectid']
-                objectinfo = cpdict['objectinfo']
-                varinfo = cpdict['varinfo']
+                objectinfo = dict(cpdict['objectinfo'])
+                varinfo = dict(cpdict['varinfo'])
+                if isinstance(varinfo.get('features'), dict):
+                    varinfo['features'] = dict(varinfo['features'])
 
                 if 'pfmethods' in cpdict:
                     pfmethods = cpdict['pfmethods']
@@ -223,16 +310,19 @@ class CheckplotHandler(tornado.web.RequestHandler):
                 # load the xmatch results, if any
                 if 'xmatch' in cpdict:
 
-                    objectxmatch = cpdict['xmatch']
-
-                    # get rid of those pesky nans
-                    for xmcat in objectxmatch:
-                        if isinstance(objectxmatch[xmcat]['info'], dict):
-                            xminfo = objectxmatch[xmcat]['info']
+                    # get rid of those pesky nans. like objectinfo and
+                    # varinfo above, each catalog's info dict is copied first
+                    # so the cached cpdict isn't changed
+                    objectxmatch = {}
+                    for xmcat, xmcatdict in cpdict['xmatch'].items():
+                        if isinstance(xmcatdict['info'], dict):
+                            xminfo = dict(xmcatdict['info'])
                             for xmek in xminfo:
                                 if (isinstance(xminfo[xmek], float) and
                                     (not np.isfinite(xminfo[xmek]))):
                                     xminfo[xmek] = None
+                            xmcatdict = dict(xmcatdict, info=xminfo)
+                        objectxmatch[xmcat] = xmcatdict
 
                 else:
                     objectxmatch = None
@@ -243,20 +333,32 @@ class CheckplotHandler(tornado.web.RequestHandler):
                 else:
                     colormagdiagram = None
 
-                # these are base64 which can be provided directly to JS to
-                # generate images (neat!)
+                # the plots are sent as URLs to the image endpoint below. the
+                # frontend loads these directly as <img> sources, so we don't
+                # have to embed the base64 encoded PNGs in the JSON. url_escape
+                # leaves '/' alone, but any in the base64 encoded checkplot
+                # name must be escaped to match the image route
+                imgurl = '%simg/%s/' % (
+                    self.baseurl,
+                    url_escape(checkplotfname, plus=False).replace('/','%2F')
+                )
 
-                if 'finderchart' in cpdict:
-                    finderchart = cpdict['finderchart']
+                if cpdict.get('finderchart') is not None:
+                    finderchart = imgurl + 'finderchart'
                 else:
                     finderchart = None
 
                 if ('magseries' in cpdict and
                     isinstance(cpdict['magseries'], dict) and
                     'plot' in cpdict['magseries']):
-                    magseries = cpdict['magseries']['plot']
-                    time0 = cpdict['magseries']['times'].min()
-                    magseries_ndet = cpdict['magseries']['times'].size
+                    magseries = imgurl + 'magseries'
+                    # older checkplots don't have these precomputed
+                    time0 = cpdict['magseries'].get('time0')
+                    if time0 is None:
+                        time0 = cpdict['magseries']['times'].min()
+                    magseries_ndet = cpdict['magseries'].get('ndet')
+                    if magseries_ndet is None:
+                        magseries_ndet = cpdict['magseries']['times'].size
                 else:
                     magseries = None
                     time0 = 0.0
@@ -404,150 +506,60 @@ class CheckplotHandler(tornado.web.RequestHandler):
                 # now get the periodograms and phased LCs
                 for key in pfmethods:
 
-                    # get the periodogram for this method
-                    periodogram = cpdict[key]['periodogram']
-
-                    # get the phased LC with best period
-                    if 0 in cpdict[key] and isinstance(cpdict[key][0], dict):
-                        phasedlc0plot = cpdict[key][0]['plot']
-                        phasedlc0period = float(cpdict[key][0]['period'])
-                        phasedlc0epoch = float(cpdict[key][0]['epoch'])
-                    else:
-                        phasedlc0plot = None
-                        phasedlc0period = None
-                        phasedlc0epoch = None
-
-                    # get the associated fitinfo for this period if it
-                    # exists
-                    if (0 in cpdict[key] and
-                        isinstance(cpdict[key][0], dict) and
-                        'lcfit' in cpdict[key][0] and
-                        isinstance(cpdict[key][0]['lcfit'], dict)):
-                        phasedlc0fit = {
-                            'method':(
-                                cpdict[key][0]['lcfit']['fittype']
-                            ),
-                            'redchisq':(
-                                cpdict[key][0]['lcfit']['fitredchisq']
-                            ),
-                            'chisq':(
-                                cpdict[key][0]['lcfit']['fitchisq']
-                            ),
-                            'params':(
-                                cpdict[key][0][
-                                    'lcfit'
-                                ]['fitinfo']['finalparams'] if
-                                'finalparams' in
-                                cpdict[key][0]['lcfit']['fitinfo'] else None
-                            )
-                        }
-                    else:
-                        phasedlc0fit = None
-
-                    # get the phased LC with 2nd best period
-                    if 1 in cpdict[key] and isinstance(cpdict[key][1], dict):
-                        phasedlc1plot = cpdict[key][1]['plot']
-                        phasedlc1period = float(cpdict[key][1]['period'])
-                        phasedlc1epoch = float(cpdict[key][1]['epoch'])
-                    else:
-                        phasedlc1plot = None
-                        phasedlc1period = None
-                        phasedlc1epoch = None
-
-                    # get the associated fitinfo for this period if it
-                    # exists
-                    if (1 in cpdict[key] and
-                        isinstance(cpdict[key][1], dict) and
-                        'lcfit' in cpdict[key][1] and
-                        isinstance(cpdict[key][1]['lcfit'], dict)):
-                        phasedlc1fit = {
-                            'method':(
-                                cpdict[key][1]['lcfit']['fittype']
-                            ),
-                            'redchisq':(
-                                cpdict[key][1]['lcfit']['fitredchisq']
-                            ),
-                            'chisq':(
-                                cpdict[key][1]['lcfit']['fitchisq']
-                            ),
-                            'params':(
-                                cpdict[key][1][
-                                    'lcfit'
-                                ]['fitinfo']['finalparams'] if
-                                'finalparams' in
-                                cpdict[key][1]['lcfit']['fitinfo'] else None
-                            )
-                        }
-                    else:
-                        phasedlc1fit = None
+                    pfmdict = cpdict[key]
 
-                    # get the phased LC with 3rd best period
-                    if 2 in cpdict[key] and isinstance(cpdict[key][2], dict):
-                        phasedlc2plot = cpdict[key][2]['plot']
-                        phasedlc2period = float(cpdict[key][2]['period'])
-                        phasedlc2epoch = float(cpdict[key][2]['epoch'])
-                    else:
-                        phasedlc2plot = None
-                        phasedlc2period = None
-                        phasedlc2epoch = None
-
-                    # get the associated fitinfo for this period if it
-                    # exists
-                    if (2 in cpdict[key] and
-                        isinstance(cpdict[key][2], dict) and
-                        'lcfit' in cpdict[key][2] and
-                        isinstance(cpdict[key][2]['lcfit'], dict)):
-                        phasedlc2fit = {
-                            'method':(
-                                cpdict[key][2]['lcfit']['fittype']
-                            ),
-                            'redchisq':(
-                                cpdict[key][2]['lcfit']['fitredchisq']
-                            ),
-                            'chisq':(
-                                cpdict[key][2]['lcfit']['fitchisq']
-                            ),
-                            'params':(
-                                cpdict[key][2][
-                                    'lcfit'
-                                ]['fitinfo']['finalparams'] if
-                                'finalparams' in
-                                cpdict[key][2]['lcfit']['fitinfo'] else None
-                            )
-                        }
+                    # get the periodogram for this method
+                    if pfmdict.get('periodogram') is not None:
+                        periodogram = imgurl + '%s-periodogram' % key
                     else:
-                        phasedlc2fit = None
+                        periodogram = None
 
                     resultdict['result'][key] = {
-                        'nbestperiods':cpdict[key]['nbestperiods'],
+                        'nbestperiods':pfmdict['nbestperiods'],
                         'periodogram':periodogram,
-                        'bestperiod':cpdict[key]['bestperiod'],
-                        'phasedlc0':{
-                            'plot':phasedlc0plot,
-                            'period':phasedlc0period,
-                            'epoch':phasedlc0epoch,
-                            'lcfit':phasedlc0fit,
-                        },
-                        'phasedlc1':{
-                            'plot':phasedlc1plot,
-                            'period':phasedlc1period,
-                            'epoch':phasedlc1epoch,
-                            'lcfit':phasedlc1fit,
-                        },
-                        'phasedlc2':{
-                            'plot':phasedlc2plot,
-                            'period':phasedlc2period,
-                            'epoch':phasedlc2epoch,
-                            'lcfit':phasedlc2fit,
-                        },
+                        'bestperiod':pfmdict['bestperiod'],
                     }
 
+                    # get the phased LCs for the best three periods and their
+                    # associated fitinfo if it exists
+                    for pind in (0, 1, 2):
+
+                        phasedlc = pfmdict.get(pind)
+
+                        if not isinstance(phasedlc, dict):
+                            resultdict['result'][key]['phasedlc%s' % pind] = {
+                                'plot':None,
+                                'period':None,
+                                'epoch':None,
+                                'lcfit':None,
+                            }
+                            continue
+
+                        lcfit = phasedlc.get('lcfit')
+
+                        if isinstance(lcfit, dict):
+                            phasedlcfit = {
+                                'method':lcfit['fittype'],
+                                'redchisq':lcfit['fitredchisq'],
+                                'chisq':lcfit['fitchisq'],
+                                'params':lcfit['fitinfo'].get('finalparams'),
+                            }
+                        else:
+                            phasedlcfit = None
+
+                        resultdict['result'][key]['phasedlc%s' % pind] = {
+                            'plot':imgurl + '%s-phasedlc%s' % (key, pind),
+                            'period':float(phasedlc['period']),
+                            'epoch':float(phasedlc['epoch']),
+                            'lcfit':phasedlcfit,
+                        }
+
                 #
                 # end of processing per pfmethod
                 #
 
                 # return the checkplot via JSON
-                self.write(resultdict)
+                self._write_json(resultdict)
                 self.finish()
 
             else:
@@ -559,8 +571,8 @@ class CheckplotHandler(tornado.web.RequestHandler):
                               'readonly':self.readonly,
                               'result':None}
 
-                self.write(resultdict)
-                self.finish()
+                self._write_json(resultdict)
+                raise tornado.web.Finish()
 
         else:
 
@@ -569,7 +581,8 @@ class CheckplotHandler(tornado.web.RequestHandler):
                           'readonly':self.readonly,
                           'result':None}
 
-            self.write(resultdict)
+            self._write_json(resultdict)
+            raise tornado.web.Finish()
 
     @gen.coroutine
     def post(self, cpfile):
@@ -592,13 +605,16 @@ class CheckplotHandler(tornado.web.RequestHandler):
                           'readonly':self.readonly,
                           'result':None}
 
-            self.write(resultdict)
+            self._write_json(resultdict)
             raise tornado.web.Finish()
 
+        # this is outside the try-except below so a bad checkplot name gets
+        # its 400 instead of being turned into a generic update error
+        self.cpfile = _safe_cpname(cpfile)
+
         # now try to update the contents
         try:
 
-            self.cpfile = base64.b64decode(url_unescape(cpfile)).decode()
             cpcontents = self.get_argument('cpcontents', default=None)
             savetopng = self.get_argument('savetopng', default=None)
 
@@ -610,10 +626,16 @@ class CheckplotHandler(tornado.web.RequestHandler):
                               'readonly':self.readonly,
                               'result':None}
 
-                self.write(resultdict)
-                raise tornado.web.Finish()
+                # this is inside the try-except below, which would also catch
+                # tornado.web.Finish, so finish and return explicitly instead
+                self._write_json(resultdict)
+                self.finish()
+                return
 
-            cpcontents = json.loads(cpcontents)
+            # parse the update in a thread so a large payload doesn't hold up
+            # the IOLoop. this isn't sent to the process pool because
+            # pickling the parsed dict back would cost more than parsing it
+            cpcontents = yield self.ioexecutor.submit(_json_loads, cpcontents)
 
             # the only keys in cpdict that can updated from the UI are from
             # varinfo, objectinfo (objecttags), uifilters, and comments
@@ -622,15 +644,27 @@ class CheckplotHandler(tornado.web.RequestHandler):
                        'comments':cpcontents['comments'],
                        'uifilters':cpcontents['uifilters']}
 
+            # only checkplots in the current project can be updated
+            if self.cpfile not in self.cpset:
+
+                msg = ("checkplot %s is not in the current project" %
+                       self.cpfile)
+                LOGGER.error(msg)
+                resultdict = {'status':'error',
+                              'message':msg,
+                              'readonly':self.readonly,
+                              'result':None}
+
+                self._write_json(resultdict)
+                self.finish()
+                return
+
             # we need to reform the self.cpfile so it points to the full path
-            cpfpath = os.path.join(
-                os.path.abspath(os.path.dirname(self.cplistfile)),
-                self.cpfile
-            )
+            cpfpath = os.path.join(self.cpdir, self.cpfile)
 
             LOGGER.info('loading %s...' % cpfpath)
 
-            if not os.path.exists(cpfpath):
+            if _stat_or_none(cpfpath) is None:
 
                 msg = "couldn't find checkplot %s" % cpfpath
                 LOGGER.error(msg)
@@ -639,12 +673,23 @@ class CheckplotHandler(tornado.web.RequestHandler):
                               'readonly':self.readonly,
                               'result':None}
 
-                self.write(resultdict)
-                raise tornado.web.Finish()
+                self._write_json(resultdict)
+                self.finish()
+                return
+
+            # dispatch the task. write with the pickle protocol set for this
+            # server and an optimized pickle stream so the checkplot is
+            # smaller and faster to load back in on the next GET
+            updated = yield self.executor.submit(
+                _update_checkplot_locked,
+                cpfpath,
+                updated,
+                pickleprotocol=self.pickleprotocol,
+                pickleoptimize=True
+            )
 
-            # dispatch the task
-            updated = yield self.executor.submit(checkplot_pickle_update,
-                                                 cpfpath, updated)
+            # the cached copy of this checkplot is now out of date
+            self.cpcache.evict(cpfpath)
 
             # continue processing after this is done
             if updated:
@@ -683,7 +728,7 @@ class CheckplotHandler(tornado.web.RequestHandler):
                     else:
                         resultdict['result']['cpfpng'] = ''
 
-                self.write(resultdict)
+                self._write_json(resultdict)
                 self.finish()
 
             else:
@@ -694,7 +739,7 @@ class CheckplotHandler(tornado.web.RequestHandler):
                               'message':msg,
                               'readonly':self.readonly,
                               'result':None}
-                self.write(resultdict)
+                self._write_json(resultdict)
                 self.finish()
 
         # if something goes wrong, inform the user
@@ -707,11 +752,115 @@ class CheckplotHandler(tornado.web.RequestHandler):
                           'message':msg,
                           'readonly':self.readonly,
                           'result':None}
-            self.write(resultdict)
+            self._write_json(resultdict)
             self.finish()
 
 
-class CheckplotListHandler(tornado.web.RequestHandler):
+class CheckplotImageHandler(BaseHandler):
+    '''This serves the plots stored in a checkplot pickle as PNG images.
+
+    The plots are stored as base64 encoded PNGs in the checkplot pickle. These
+    are decoded here and sent to the frontend as binary images, which is
+    smaller on the wire than embedding the base64 in the JSON returned by
+    `CheckplotHandler`, and saves the browser from having to decode it.
+
+    '''
+
+    def initialize(self, currentdir, assetpath, cplist,
+                   cplistfile, executor, readonly, cpcache, cpdir, cpset,
+                   ioexecutor):
+        '''
+        This handles initial setup of this `RequestHandler`.
+
+        '''
+
+        self.currentdir = currentdir
+        self.assetpath = assetpath
+        self.currentproject = cplist
+        self.cplistfile = cplistfile
+        self.executor = executor
+        self.ioexecutor = ioexecutor
+        self.readonly = readonly
+        self.cpcache = cpcache
+        self.cpdir = cpdir
+        self.cpset = cpset
+
+    @gen.coroutine
+    def get(self, checkplotfname, plotkey):
+        '''This handles GET requests for a single plot in a checkplot.
+
+        The URI structure is::
+
+            /img/<checkplotfname>/<plotkey>
+
+        where `checkplotfname` is the base64 encoded checkplot filename, the
+        same as for `CheckplotHandler`, and `plotkey` is one of::
+
+            finderchart
+            magseries
+            <pfmethod>-periodogram
+            <pfmethod>-phasedlc<N>  (N = 0, 1, 2)
+
+        '''
+
+        checkplotfname = _safe_cpname(checkplotfname)
+
+        if checkplotfname not in self.cpset:
+            raise tornado.web.HTTPError(404)
+
+        cpfpath = os.path.join(self.cpdir, checkplotfname)
+
+        cpstat = _stat_or_none(cpfpath)
+
+        if cpstat is None:
+            raise tornado.web.HTTPError(404)
+
+        cpdict = yield self._read_checkplot(cpfpath, cpstat.st_mtime)
+
+        try:
+
+            if plotkey == 'finderchart':
+                plot = cpdict['finderchart']
+
+            elif plotkey == 'magseries':
+                plot = cpdict['magseries']['plot']
+
+            else:
+
+                pfmethod, plotkind = plotkey.rsplit('-', 1)
+
+                # only look up the period-finder results in this checkplot, so
+                # other keys in the checkplot dict can't be requested as plots
+                if 'pfmethods' in cpdict:
+                    pfmethods = cpdict['pfmethods']
+                else:
+                    pfmethods = PFMETHODS
+
+                if pfmethod not in pfmethods:
+                    plot = None
+                elif plotkind == 'periodogram':
+                    plot = cpdict[pfmethod]['periodogram']
+                elif plotkind.startswith('phasedlc'):
+                    plot = cpdict[pfmethod][int(plotkind[8:])]['plot']
+                else:
+                    plot = None
+
+            if isinstance(plot, (str, bytes)):
+                pngbytes = base64.b64decode(plot)
+            else:
+                pngbytes = None
+
+        except (KeyError, IndexError, TypeError, ValueError):
+            pngbytes = None
+
+        if not pngbytes:
+            raise tornado.web.HTTPError(404)
+
+        self.set_header('Content-Type', 'image/png')
+        self.write(pngbytes)
+
+
+class CheckplotListHandler(BaseHandler):
     '''This handles loading and saving the checkplot-filelist.json file.
 
     GET requests just return the current contents of the checkplot-filelist.json
@@ -721,7 +870,8 @@ class CheckplotListHandler(tornado.web.RequestHandler):
     '''
 
     def initialize(self, currentdir, assetpath, cplist,
-                   cplistfile, executor, readonly):
+                   cplistfile, executor, readonly, cplistexecutor,
+                   cplistcache):
         '''
         This handles initial setup of the `RequestHandler`.
 
@@ -732,7 +882,9 @@ class CheckplotListHandler(tornado.web.RequestHandler):
         self.currentproject = cplist
         self.cplistfile = cplistfile
         self.executor = executor
+        self.cplistexecutor = cplistexecutor
         self.readonly = readonly
+        self.cplistcache = cplistcache
 
     def get(self):
         '''
@@ -746,10 +898,14 @@ class CheckplotListHandler(tornado.web.RequestHandler):
         # this will hold all the reviewed objects for the frontend
         if 'reviewed' not in self.currentproject:
             self.currentproject['reviewed'] = {}
+            self.cplistcache.invalidate()
 
-        # just returns the current project as JSON
-        self.write(self.currentproject)
+        # just returns the current project as JSON. this is only re-encoded if
+        # the project has changed since the last time it was sent
+        self.set_header('Content-Type', 'application/json; charset=UTF-8')
+        self.write(self.cplistcache.get(self.currentproject))
 
+    @gen.coroutine
     def post(self):
         '''This handles POST requests.
 
@@ -768,7 +924,7 @@ class CheckplotListHandler(tornado.web.RequestHandler):
                           'readonly':self.readonly,
                           'result':None}
 
-            self.write(resultdict)
+            self._write_json(resultdict)
             raise tornado.web.Finish()
 
         objectid = self.get_argument('objectid', None)
@@ -785,22 +941,30 @@ class CheckplotListHandler(tornado.web.RequestHandler):
                           'readonly':self.readonly,
                           'result':None}
 
-            self.write(resultdict)
+            self._write_json(resultdict)
             raise tornado.web.Finish()
 
         # otherwise, update the checkplot list JSON
         objectid = xhtml_escape(objectid)
-        changes = json.loads(changes)
+        changes = _json_loads(changes)
 
         # update the dictionary
         if 'reviewed' not in self.currentproject:
             self.currentproject['reviewed'] = {}
 
         self.currentproject['reviewed'][objectid] = changes
-
-        # update the JSON file
-        with open(self.cplistfile,'w') as outfd:
-            json.dump(self.currentproject, outfd)
+        self.cplistcache.invalidate()
+
+        # update the JSON file. the project is encoded here on the IOLoop, so
+        # each POST gets a snapshot that includes its own change. the bytes are
+        # then written out by a background thread so we don't block other
+        # requests while writing a large project file. self.cplistexecutor has
+        # a single worker, so the writes happen in the same order as the POSTs
+        # and an older snapshot can't overwrite a newer one.
+        projectjson = self.cplistcache.get(self.currentproject)
+        yield self.cplistexecutor.submit(_write_json_atomic,
+                                         self.cplistfile,
+                                         projectjson)
 
         # return status
         msg = ("wrote all changes to the checkplot filelist "
@@ -812,5 +976,5 @@ class CheckplotListHandler(tornado.web.RequestHandler):
                       'result':{'objectid':objectid,
                                 'changes':changes}}
 
-        self.write(resultdict)
+        self._write_json(resultdict)
         self.finish()
@@ -14,7 +14,9 @@ These are Tornado handlers for serving checkplots and operating on them.
 
 import os
 import os.path
+import importlib
 import logging
+from collections import OrderedDict
 
 import numpy as np
 from numpy import ndarray
@@ -80,6 +82,68 @@ class FrontendEncoder(json.JSONEncoder):
 # tornado.web.RequestHandler.write(dict) is called.
 json._default_encoder = FrontendEncoder()
 
+
+# orjson is much faster than the stdlib encoder for the large dicts of base64
+# encoded plots that we send to the frontend. use it if it's available.
+try:
+    import orjson
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+except ImportError:
+    orjson = None
+
+
+def _orjson_default(obj):
+    '''This serializes objects that orjson can't handle by itself.
+
+    orjson already handles numpy scalars and C-contiguous arrays of the usual
+    dtypes when `OPT_SERIALIZE_NUMPY` is set, and turns NaNs into nulls, so
+    this only needs to deal with the leftovers.
+
+    '''
+
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj, bytes):
+        return obj.decode()
+    elif isinstance(obj, complex):
+        return (obj.real, obj.imag)
+    else:
+        raise TypeError('%r is not JSON serializable' % type(obj))
+
+
+def _json_dumps(obj):
+    '''This serializes `obj` to JSON bytes for sending to the frontend.
+
+    Uses orjson if available, otherwise falls back to the stdlib `json` module.
+    Since no encoder kwargs are passed to `json.dumps`, it reuses the single
+    module-level `FrontendEncoder` instance set up above. Like
+    `tornado.escape.json_encode`, this escapes '</' so the JSON can be safely
+    embedded in HTML.
+
+    '''
+
+    if orjson is not None:
+        encoded = orjson.dumps(obj,
+                               default=_orjson_default,
+                               option=_ORJSON_OPTIONS)
+    else:
+        encoded = json.dumps(obj).encode('utf-8')
+
+    return encoded.replace(b'</', b'<\\/')
+
+
+def _json_loads(jsonstr):
+    '''
+    This deserializes a JSON str or bytes from the frontend.
+
+    '''
+
+    if orjson is not None:
+        return orjson.loads(jsonstr)
+    else:
+        return json.loads(jsonstr)
+
+
 #############
 ## LOGGING ##
 #############
@@ -94,6 +158,7 @@ LOGGER = logging.getLogger(__name__)
 import tornado.ioloop
 import tornado.httpserver
 import tornado.web
+from tornado import gen
 
 ###################
 ## LOCAL IMPORTS ##
@@ -101,15 +166,13 @@ import tornado.web
 
 from ..varclass import varfeatures
 from .. import lcfit
-from ..varbase import signals
+from ..checkplot.pkl_io import base64, _read_checkplot_picklefile
 from ..checkplot.pkl_utils import _pkl_phased_magseries_plot
 
-from ..periodbase import zgls
-from ..periodbase import saov
-from ..periodbase import smav
-from ..periodbase import spdm
-from ..periodbase import kbls
-from ..periodbase import macf
+# astrobase.periodbase (also imported by astrobase.varbase.signals) pulls in
+# all of the period-finders and astropy, which slows down server startup quite
+# a bit. these are only imported the first time an lctool that needs them is
+# run. see _cptool_func below.
 
 
 ############
@@ -159,7 +222,7 @@ CPTOOLMAP = {
                      True, 1.0e-4, 10,
                      None, None,
                      None, 0.1),
-        'func':zgls.pgen_lsp,
+        'func':'periodbase.zgls.pgen_lsp',
         'resloc':['gls'],
     },
     'psearch-bls':{
@@ -177,7 +240,7 @@ CPTOOLMAP = {
                      True, 1.0e-4, 10,
                      None, None, None,
                      0.1, 0.01, 0.08),
-        'func':kbls.bls_parallel_pfind,
+        'func':'periodbase.kbls.bls_parallel_pfind',
         'resloc':['bls'],
     },
     'psearch-pdm':{
@@ -195,7 +258,7 @@ CPTOOLMAP = {
                      True, 1.0e-4, 10,
                      None, None, None,
                      0.1, 0.05, 9),
-        'func':spdm.stellingwerf_pdm,
+        'func':'periodbase.spdm.stellingwerf_pdm',
         'resloc':['pdm'],
     },
     'psearch-aov':{
@@ -213,7 +276,7 @@ CPTOOLMAP = {
                      True, 1.0e-4, 10,
                      None, None, None,
                      0.1, 0.05, 9),
-        'func':saov.aov_periodfind,
+        'func':'periodbase.saov.aov_periodfind',
         'resloc':['aov'],
     },
     'psearch-mav':{
@@ -231,7 +294,7 @@ CPTOOLMAP = {
                      True, 1.0e-4, 10,
                      None, None, None,
                      0.1, 6),
-        'func':smav.aovhm_periodfind,
+        'func':'periodbase.smav.aovhm_periodfind',
         'resloc':['mav'],
     },
     'psearch-acf':{
@@ -249,7 +312,7 @@ CPTOOLMAP = {
                      True, 1.0e-4, 721,
                      None, None, None,
                      0.1, 0.0),
-        'func':macf.macf_period_find,
+        'func':'periodbase.macf.macf_period_find',
         'resloc':['acf'],
     },
     'psearch-win':{
@@ -267,7 +330,7 @@ CPTOOLMAP = {
                      True, 1.0e-4, 10,
                      None, None, None,
                      0.1),
-        'func':zgls.specwindow_lsp,
+        'func':'periodbase.zgls.specwindow_lsp',
         'resloc':['win'],
     },
     ## PLOTTING A NEW PHASED LC ##
@@ -302,7 +365,7 @@ CPTOOLMAP = {
         'kwargs':('magsarefluxes',),
         'kwargtypes':(bool,),
         'kwargdefs':(False,),
-        'func':signals.prewhiten_magseries,
+        'func':'varbase.signals.prewhiten_magseries',
         'resloc':['signals','prewhiten'],
     },
     'var-masksig':{
@@ -311,7 +374,7 @@ CPTOOLMAP = {
         'kwargs':('magsarefluxes','maskphases[]','maskphaselength'),
         'kwargtypes':(bool, list, float),
         'kwargdefs':(False, [0.0,0.5,1.0], 0.1),
-        'func':signals.mask_signal,
+        'func':'varbase.signals.mask_signal',
         'resloc':['signals','mask'],
     },
     # FIXME: add sigclip, lctimefilters, and lcmagfilters for all of these
@@ -367,10 +430,242 @@ CPTOOLMAP = {
 }
 
 
+def _cptool_func(lctool):
+    '''This returns the function to run for `lctool` from `CPTOOLMAP`.
+
+    Functions that are given in `CPTOOLMAP` as a str (a dotted path relative to
+    the astrobase package) are imported here the first time they're needed and
+    then put back into `CPTOOLMAP`.
+
+    '''
+
+    func = CPTOOLMAP[lctool]['func']
+
+    if isinstance(func, str):
+
+        modname, funcname = func.rsplit('.', 1)
+        module = importlib.import_module('..%s' % modname, package=__package__)
+        func = getattr(module, funcname)
+        CPTOOLMAP[lctool]['func'] = func
+
+    return func
+
+
+#########################
+## CHECKPLOT FILENAMES ##
+#########################
+
+def _safe_cpname(b64name):
+    '''This decodes a base64 encoded checkplot name from a request URL.
+
+    Tornado has already URL-unescaped the path argument by the time it gets
+    here, so this doesn't do it again. (Doing so would turn any '+' in the
+    base64 string into a space.)
+
+    Checkplot names come from the checkplot list JSON and can be any path, so
+    this doesn't restrict the characters in them. Callers must check that the
+    returned name is in the current project's `cpset` before using it to build
+    a path; that membership check is what keeps requests inside the project.
+
+    Raises a `tornado.web.HTTPError` (400) if the name isn't valid base64 or
+    doesn't decode to UTF-8 text.
+
+    '''
+
+    try:
+        return base64.b64decode(b64name).decode('utf-8')
+    except ValueError:
+        raise tornado.web.HTTPError(400)
+
+
+#####################
+## CHECKPLOT CACHE ##
+#####################
+
+def _stat_or_none(fpath):
+    '''This returns the `os.stat` result for `fpath` or None if it's missing.
+
+    This lets the handlers check that a checkplot exists and get its mtime for
+    the cache key with a single syscall.
+
+    '''
+
+    try:
+        return os.stat(fpath)
+    except OSError:
+        return None
+
+
+class CheckplotCache(object):
+    '''This is a bounded LRU cache for checkplot dicts read from pickles.
+
+    Entries are keyed by `(cpfpath, mtime)`, so a checkplot pickle that has
+    been rewritten on disk will never be served from a stale entry. Checkplots
+    are read by threads in the `ioexecutor` thread pool, so the unpickled dicts
+    already end up in the main server process and can be cached there directly
+    for later requests.
+
+    The cached checkplot dicts are shared between requests, so handlers must
+    treat them as read-only and copy anything they need to change.
+
+    '''
+
+    def __init__(self, maxsize=16):
+        '''
+        Sets up the cache.
+
+        Parameters
+        ----------
+
+        maxsize : int
+            The maximum number of checkplot dicts to hold in memory. If this is
+            0, nothing will be cached.
+
+        '''
+
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+
+        # reads of checkplots that are in progress, keyed by (cpfpath, mtime).
+        # requests for a checkplot that's already being read wait on the same
+        # read instead of starting another one
+        self.pending = {}
+
+    def get(self, cpfpath, mtime):
+        '''This returns the cached checkplot dict for `cpfpath` at `mtime`.
+
+        Returns None if there's no cached entry.
+
+        '''
+
+        key = (cpfpath, mtime)
+
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        return None
+
+    def put(self, cpfpath, mtime, cpdict):
+        '''
+        This adds a checkplot dict to the cache, evicting old entries if needed.
+
+        '''
+
+        if self.maxsize <= 0:
+            return
+
+        # get rid of any stale entries for this checkplot first
+        self.evict(cpfpath)
+
+        self._cache[(cpfpath, mtime)] = cpdict
+
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def evict(self, cpfpath):
+        '''
+        This removes all cached entries for `cpfpath`.
+
+        '''
+
+        for key in [x for x in self._cache if x[0] == cpfpath]:
+            del self._cache[key]
+
+
+class ProjectJSONCache(object):
+    '''This holds the serialized JSON for the current checkplot project.
+
+    The checkplot list is only changed by `CheckplotListHandler.post`, which
+    calls `invalidate` afterwards. Until then, the frontend's repeated GETs of
+    the project are served from the same encoded bytes.
+
+    '''
+
+    def __init__(self):
+        '''
+        Sets up the cache.
+
+        '''
+
+        self._cached = None
+
+    def get(self, project):
+        '''This returns the JSON bytes for `project`, encoding it if needed.
+
+        '''
+
+        if self._cached is None:
+            self._cached = _json_dumps(project)
+
+        return self._cached
+
+    def invalidate(self):
+        '''
+        This marks the cached JSON as out of date after the project changes.
+
+        '''
+
+        self._cached = None
+
+
 #####################
 ## HANDLER CLASSES ##
 #####################
 
+class BaseHandler(tornado.web.RequestHandler):
+    '''This is the base class for handlers that return JSON to the frontend.
+
+    '''
+
+    def _write_json(self, resultdict):
+        '''This writes `resultdict` to the response as JSON.
+
+        This should be used instead of `self.write(dict)`, which always goes
+        through the slower stdlib `json` encoder.
+
+        '''
+
+        self.set_header('Content-Type', 'application/json; charset=UTF-8')
+        self.write(_json_dumps(resultdict))
+
+    @gen.coroutine
+    def _read_checkplot(self, cpfpath, cpmtime):
+        '''This reads a checkplot pickle, using `self.cpcache` if possible.
+
+        `cpmtime` is the modification time of `cpfpath`, usually from the
+        `os.stat` result that was used to check that the file exists. If the
+        checkplot isn't in the cache or has changed on disk since it was cached,
+        it's read using `self.ioexecutor` and then added to the cache. If the
+        same checkplot is already being read for another request, this waits
+        for that read instead of starting a new one.
+
+        '''
+
+        cpdict = self.cpcache.get(cpfpath, cpmtime)
+
+        if cpdict is None:
+
+            key = (cpfpath, cpmtime)
+            pending = self.cpcache.pending.get(key)
+
+            if pending is None:
+                pending = self.ioexecutor.submit(
+                    _read_checkplot_picklefile, cpfpath
+                )
+                self.cpcache.pending[key] = pending
+
+            try:
+                cpdict = yield pending
+            finally:
+                if self.cpcache.pending.get(key) is pending:
+                    del self.cpcache.pending[key]
+
+            self.cpcache.put(cpfpath, cpmtime, cpdict)
+
+        return cpdict
+
+
 class IndexHandler(tornado.web.RequestHandler):
 
     '''This handles the index page.
@@ -14,7 +14,6 @@ These are Tornado handlers for serving checkplots and operating on them.
 
 import os
 import os.path
-import base64
 import logging
 
 import json
@@ -47,9 +46,10 @@ from tornado import gen
 ###################
 
 from ..checkplot.pkl_io import (
+    base64,
     _read_checkplot_picklefile,
 )
-from .checkplotserver_handlers import PFMETHODS
+from .checkplotserver_handlers import PFMETHODS, BaseHandler
 
 
 ###########################################################
@@ -78,7 +78,7 @@ def _time_independent_equals(a, b):
     return result == 0
 
 
-class StandaloneHandler(tornado.web.RequestHandler):
+class StandaloneHandler(BaseHandler):
     '''This handles loading checkplots into JSON and sending that back.
 
     This is a special handler used when `checkplotserver` is in 'stand-alone'
@@ -118,7 +118,7 @@ class StandaloneHandler(tornado.web.RequestHandler):
                        'result':None,
                        'readonly':True}
             self.set_status(401)
-            self.write(retdict)
+            self._write_json(retdict)
             raise tornado.web.Finish()
 
         else:
@@ -135,7 +135,7 @@ class StandaloneHandler(tornado.web.RequestHandler):
                            'result':None,
                            'readonly':True}
                 self.set_status(401)
-                self.write(retdict)
+                self._write_json(retdict)
                 raise tornado.web.Finish()
 
         #
@@ -160,7 +160,7 @@ class StandaloneHandler(tornado.web.RequestHandler):
                               'result':None,
                               'readonly':True}
                 self.set_status(400)
-                self.write(resultdict)
+                self._write_json(resultdict)
                 raise tornado.web.Finish()
 
             LOGGER.info('loading %s...' % cpfpath)
@@ -175,7 +175,7 @@ class StandaloneHandler(tornado.web.RequestHandler):
                               'readonly':True}
 
                 self.set_status(404)
-                self.write(resultdict)
+                self._write_json(resultdict)
                 raise tornado.web.Finish()
 
             #
@@ -308,8 +308,13 @@ class StandaloneHandler(tornado.web.RequestHandler):
                 isinstance(cpdict['magseries'], dict) and
                 'plot' in cpdict['magseries']):
                 magseries = cpdict['magseries']['plot']
-                time0 = cpdict['magseries']['times'].min()
-                magseries_ndet = cpdict['magseries']['times'].size
+                # older checkplots don't have these precomputed
+                time0 = cpdict['magseries'].get('time0')
+                if time0 is None:
+                    time0 = cpdict['magseries']['times'].min()
+                magseries_ndet = cpdict['magseries'].get('ndet')
+                if magseries_ndet is None:
+                    magseries_ndet = cpdict['magseries']['times'].size
             else:
                 magseries = None
                 time0 = 0.0
@@ -500,8 +505,7 @@ class StandaloneHandler(tornado.web.RequestHandler):
             #
             # end of processing per pfmethod
             #
-            self.set_header('Content-Type','application/json; charset=UTF-8')
-            self.write(resultdict)
+            self._write_json(resultdict)
             self.finish()
 
         else:
@@ -513,6 +517,6 @@ class StandaloneHandler(tornado.web.RequestHandler):
                           'readonly':True,
                           'result':None}
 
-            self.status(400)
-            self.write(resultdict)
+            self.set_status(400)
+            self._write_json(resultdict)
             self.finish()
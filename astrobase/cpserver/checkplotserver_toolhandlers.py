@@ -14,7 +14,6 @@ These are Tornado handlers for serving checkplots and operating on them.
 
 import os
 import os.path
-import base64
 import logging
 from io import BytesIO as StrIO
 import numpy as np
@@ -51,20 +50,27 @@ from tornado import gen
 from .. import lcmath
 
 from ..checkplot.pkl_io import (
+    base64,
     _read_checkplot_picklefile,
     _write_checkplot_picklefile
 )
 from ..checkplot.pkl_utils import _pkl_periodogram, _pkl_phased_magseries_plot
 from .. import lcfit
 
-from .checkplotserver_handlers import CPTOOLMAP
+from .checkplotserver_handlers import (
+    CPTOOLMAP,
+    BaseHandler,
+    _cptool_func,
+    _stat_or_none,
+    _safe_cpname,
+)
 
 
 #############################
 ## CHECKPLOT TOOL HANDLERS ##
 #############################
 
-class LCToolHandler(tornado.web.RequestHandler):
+class LCToolHandler(BaseHandler):
     '''This handles dispatching light curve analysis tasks.
 
     GET requests run the light curve tools specified in the URI with arguments
@@ -76,7 +82,8 @@ class LCToolHandler(tornado.web.RequestHandler):
     '''
 
     def initialize(self, currentdir, assetpath, cplist,
-                   cplistfile, executor, readonly):
+                   cplistfile, executor, readonly, cpcache, cpdir, cpset,
+                   ioexecutor):
         '''
         This handles initial setup of the `RequestHandler`.
 
@@ -87,7 +94,11 @@ class LCToolHandler(tornado.web.RequestHandler):
         self.currentproject = cplist
         self.cplistfile = cplistfile
         self.executor = executor
+        self.ioexecutor = ioexecutor
         self.readonly = readonly
+        self.cpcache = cpcache
+        self.cpdir = cpdir
+        self.cpset = cpset
 
     @gen.coroutine
     def get(self, cpfile):
@@ -171,21 +182,18 @@ class LCToolHandler(tornado.web.RequestHandler):
 
         if cpfile:
 
-            self.cpfile = (
-                xhtml_escape(base64.b64decode(url_unescape(cpfile)))
-            )
+            self.cpfile = _safe_cpname(cpfile)
 
             # see if this plot is in the current project
-            if self.cpfile in self.currentproject['checkplots']:
+            if self.cpfile in self.cpset:
 
                 # make sure this file exists
-                cpfpath = os.path.join(
-                    os.path.abspath(os.path.dirname(self.cplistfile)),
-                    self.cpfile
-                )
+                cpfpath = os.path.join(self.cpdir, self.cpfile)
 
                 # if we can't find the pickle, quit immediately
-                if not os.path.exists(cpfpath):
+                cpstat = _stat_or_none(cpfpath)
+
+                if cpstat is None:
 
                     msg = "couldn't find checkplot %s" % cpfpath
                     LOGGER.error(msg)
@@ -194,7 +202,7 @@ class LCToolHandler(tornado.web.RequestHandler):
                                   'readonly':self.readonly,
                                   'result':None}
 
-                    self.write(resultdict)
+                    self._write_json(resultdict)
                     raise tornado.web.Finish()
 
                 ###########################
@@ -307,7 +315,7 @@ class LCToolHandler(tornado.web.RequestHandler):
                             )
                             resultdict['result'] = {'objectid':cpobjectid}
 
-                            self.write(resultdict)
+                            self._write_json(resultdict)
                             raise tornado.web.Finish()
 
                     # if the tool is not in the CPTOOLSMAP
@@ -319,7 +327,7 @@ class LCToolHandler(tornado.web.RequestHandler):
                         )
                         resultdict['result'] = {'objectid':cpobjectid}
 
-                        self.write(resultdict)
+                        self._write_json(resultdict)
                         raise tornado.web.Finish()
 
                 # if no lctool arg is provided
@@ -332,7 +340,7 @@ class LCToolHandler(tornado.web.RequestHandler):
                     )
                     resultdict['result'] = {'objectid':cpobjectid}
 
-                    self.write(resultdict)
+                    self._write_json(resultdict)
                     raise tornado.web.Finish()
 
                 ##############################################
@@ -341,10 +349,9 @@ class LCToolHandler(tornado.web.RequestHandler):
 
                 LOGGER.info('loading %s...' % cpfpath)
 
-                # this loads the actual checkplot pickle
-                cpdict = yield self.executor.submit(
-                    _read_checkplot_picklefile, cpfpath
-                )
+                # this loads the actual checkplot pickle, using the cached copy
+                # if it's still current
+                cpdict = yield self._read_checkplot(cpfpath, cpstat.st_mtime)
 
                 # we check for the existence of a cpfpath + '-cpserver-temp'
                 # file first. this is where we store stuff before we write it
@@ -354,7 +361,7 @@ class LCToolHandler(tornado.web.RequestHandler):
                 # load the temp checkplot if it exists
                 if os.path.exists(tempfpath):
 
-                    tempcpdict = yield self.executor.submit(
+                    tempcpdict = yield self.ioexecutor.submit(
                         _read_checkplot_picklefile, tempfpath
                     )
 
@@ -450,7 +457,7 @@ class LCToolHandler(tornado.web.RequestHandler):
                             )
                             resultdict['result'] = {'objectid':cpobjectid}
 
-                            self.write(resultdict)
+                            self._write_json(resultdict)
                             raise tornado.web.Finish()
 
                 LOGGER.info(lctool)
@@ -564,7 +571,7 @@ class LCToolHandler(tornado.web.RequestHandler):
                             }
                         }
 
-                        self.write(resultdict)
+                        self._write_json(resultdict)
                         self.finish()
 
                     # otherwise, we have to rerun the periodogram method
@@ -727,7 +734,7 @@ class LCToolHandler(tornado.web.RequestHandler):
                         # now run the period finder and get results
                         #
 
-                        lctoolfunction = CPTOOLMAP[lctool]['func']
+                        lctoolfunction = _cptool_func(lctool)
 
                         # run the period finder
                         funcresults = yield self.executor.submit(
@@ -920,7 +927,7 @@ class LCToolHandler(tornado.web.RequestHandler):
                             }
 
                         # return to frontend
-                        self.write(resultdict)
+                        self._write_json(resultdict)
                         self.finish()
 
                 # if the lctool is a call to the phased LC plot itself
@@ -964,7 +971,7 @@ class LCToolHandler(tornado.web.RequestHandler):
                             }
                         }
 
-                        self.write(resultdict)
+                        self._write_json(resultdict)
                         self.finish()
 
                     # otherwise, we need to dispatch the function
@@ -1178,7 +1185,7 @@ class LCToolHandler(tornado.web.RequestHandler):
                         # already earlier
                         del lctoolkwargs['sigclip']
 
-                        lctoolfunction = CPTOOLMAP[lctool]['func']
+                        lctoolfunction = _cptool_func(lctool)
 
                         funcresults = yield self.executor.submit(
                             lctoolfunction,
@@ -1248,7 +1255,7 @@ class LCToolHandler(tornado.web.RequestHandler):
                             }
                         }
 
-                        self.write(resultdict)
+                        self._write_json(resultdict)
                         self.finish()
 
                 # if the lctool is var-varfeatures
@@ -1287,13 +1294,13 @@ class LCToolHandler(tornado.web.RequestHandler):
                             }
                         }
 
-                        self.write(resultdict)
+                        self._write_json(resultdict)
                         self.finish()
 
                     # otherwise, we need to dispatch the function
                     else:
 
-                        lctoolfunction = CPTOOLMAP[lctool]['func']
+                        lctoolfunction = _cptool_func(lctool)
                         funcresults = yield self.executor.submit(
                             lctoolfunction,
                             *lctoolargs,
@@ -1362,7 +1369,7 @@ class LCToolHandler(tornado.web.RequestHandler):
                             }
                         }
 
-                        self.write(resultdict)
+                        self._write_json(resultdict)
                         self.finish()
 
                 # if the lctool is var-prewhiten or var-masksig
@@ -1402,13 +1409,13 @@ class LCToolHandler(tornado.web.RequestHandler):
                             }
                         }
 
-                        self.write(resultdict)
+                        self._write_json(resultdict)
                         self.finish()
 
                     # otherwise, we need to dispatch the function
                     else:
 
-                        lctoolfunction = CPTOOLMAP[lctool]['func']
+                        lctoolfunction = _cptool_func(lctool)
 
                         # send in a stringio object for the fitplot kwarg
                         lctoolkwargs['plotfit'] = StrIO()
@@ -1493,7 +1500,7 @@ class LCToolHandler(tornado.web.RequestHandler):
                             }
                         }
 
-                        self.write(resultdict)
+                        self._write_json(resultdict)
                         self.finish()
 
                 # if the lctool is a lcfit method
@@ -1560,13 +1567,13 @@ class LCToolHandler(tornado.web.RequestHandler):
                             }
                         }
 
-                        self.write(resultdict)
+                        self._write_json(resultdict)
                         self.finish()
 
                     # otherwise, we need to dispatch the function
                     else:
 
-                        lctoolfunction = CPTOOLMAP[lctool]['func']
+                        lctoolfunction = _cptool_func(lctool)
 
                         funcresults = yield self.executor.submit(
                             lctoolfunction,
@@ -1680,7 +1687,7 @@ class LCToolHandler(tornado.web.RequestHandler):
                             }
                         }
 
-                        self.write(resultdict)
+                        self._write_json(resultdict)
                         self.finish()
 
                 # if this is the special lcfit subtract tool
@@ -1720,7 +1727,7 @@ class LCToolHandler(tornado.web.RequestHandler):
                     )
                     resultdict['result'] = {'objectid':cpobjectid}
 
-                    self.write(resultdict)
+                    self._write_json(resultdict)
                     self.finish()
 
                 # if this is the special load results tool
@@ -1746,7 +1753,7 @@ class LCToolHandler(tornado.web.RequestHandler):
                             )
                             resultdict['result'] = {'objectid':cpobjectid}
 
-                            self.write(resultdict)
+                            self._write_json(resultdict)
                             raise tornado.web.Finish()
 
                         # if we're good to go, get the target location
@@ -1774,7 +1781,7 @@ class LCToolHandler(tornado.web.RequestHandler):
                     )
                     resultdict['result'] = {'objectid':cpobjectid}
 
-                    self.write(resultdict)
+                    self._write_json(resultdict)
                     raise tornado.web.Finish()
 
             # if the cpfile doesn't exist
@@ -1787,7 +1794,7 @@ class LCToolHandler(tornado.web.RequestHandler):
                               'readonly':self.readonly,
                               'result':None}
 
-                self.write(resultdict)
+                self._write_json(resultdict)
                 raise tornado.web.Finish()
 
         # if no checkplot was provided to load
@@ -1798,7 +1805,7 @@ class LCToolHandler(tornado.web.RequestHandler):
                           'readonly':self.readonly,
                           'result':None}
 
-            self.write(resultdict)
+            self._write_json(resultdict)
             raise tornado.web.Finish()
 
     def post(self, cpfile):
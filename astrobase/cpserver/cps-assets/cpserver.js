@@ -47,18 +47,37 @@ var cputils = {
   },
 
 
-  // this turns a base64 string into an image by updating its source
+  // this returns the src for an image sent by the backend. checkplot plots
+  // come in as URLs to the checkplotserver's img/ endpoint, while results
+  // from the LC tools come in as base64 strings. missing plots (e.g. no finder
+  // chart in this checkplot) get a placeholder image
+  img_src: function (str) {
+
+    if (str === null || str === undefined) {
+      return cpv.CPSERVER_BASEURL + 'static/no-tool-results.png';
+    }
+    else if (str.indexOf(cpv.CPSERVER_BASEURL + 'img/') === 0) {
+      return str;
+    }
+    else {
+      return 'data:image/png;base64,' + str;
+    }
+
+  },
+
+  // this turns a base64 string or image URL into an image by updating its
+  // source
   b64_to_image: function (str, targetelem) {
 
-    var datauri = 'data:image/png;base64,' + str;
+    var datauri = cputils.img_src(str);
     $(targetelem).attr('src',datauri);
 
   },
 
-  // this displays a base64 encoded image on the canvas
+  // this displays a base64 encoded image or image URL on the canvas
   b64_to_canvas: function (str, targetelem) {
 
-    var datauri = 'data:image/png;base64,' + str;
+    var datauri = cputils.img_src(str);
     var newimg = new Image();
     var canvas = document.getElementById(targetelem.replace('#',''));
 
@@ -1440,8 +1459,8 @@ var cpv = {
           var periodogram_row =
               '<div class="row periodogram-container">' +
               '<div class="col-sm-12">' +
-              '<img src="data:image/png;base64,' +
-              cpv.currcp[lspmethod].periodogram + '" ' +
+              '<img src="' +
+              cputils.img_src(cpv.currcp[lspmethod].periodogram) + '" ' +
               'class="img-fluid" id="periodogram-' +
               lspmethod + '">' + '</div></div>';
 
@@ -1473,8 +1492,9 @@ var cpv = {
                   '<div class="row py-1 phasedlc-container-row" ' +
                   'data-periodind="' + periodind + '">' +
                   '<div class="col-sm-12">' +
-                  '<img src="data:image/png;base64,' +
-                  cpv.currcp[lspmethod][periodind].plot + '"' +
+                  '<img src="' +
+                  cputils.img_src(cpv.currcp[lspmethod][periodind].plot) +
+                  '"' +
                   'class="img-fluid zoomable-tile" id="plot-' +
                   periodind + '">' + '</div></div></a>';
 
@@ -1752,8 +1772,8 @@ var cpv = {
 
       var rowplots = [
         '<div class="col-sm-' + nbrcolw + ' mx-0 px-0">' +
-          '<img src="data:image/png;base64,' +
-          cpv.currcp.magseries +
+          '<img src="' +
+          cputils.img_src(cpv.currcp.magseries) +
           '" class="img-fluid zoomable-tile">' +
           '</div>'
       ];
@@ -1764,8 +1784,10 @@ var cpv = {
 
           var thisnphased =
               '<div class="col-sm-' + nbrcolw + ' mx-0 px-0">' +
-              '<img src="data:image/png;base64,' +
-              cpv.currcp[lspmethods[nli]]['phasedlc0']['plot'] +
+              '<img src="' +
+              cputils.img_src(
+                cpv.currcp[lspmethods[nli]]['phasedlc0']['plot']
+              ) +
               '" class="img-fluid zoomable-tile">' +
               '</div>';
           rowplots.push(thisnphased);
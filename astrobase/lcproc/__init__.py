@@ -96,10 +96,7 @@ LOGEXCEPTION = LOGGER.exception
 ## IMPORTS ##
 #############
 
-try:
-    import cPickle as pickle
-except Exception:
-    import pickle
+import pickle
 import gzip
 import os.path
 import os
@@ -108,10 +108,7 @@ import json
 import sys
 import time
 
-try:
-    import cPickle as pickle
-except Exception:
-    import pickle
+import pickle
 
 
 # import url methods here.  we use built-ins because we want this module to be
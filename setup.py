@@ -72,6 +72,8 @@ EXTRAS_REQUIRE = {
         'google-api-python-client',
         'google-cloud-storage',
         'google-cloud-pubsub',
+        'pybase64',
+        'orjson',
     ],
     # for lcfit.mandelagol_fit_magseries
     'mandelagol':[
@@ -100,6 +102,11 @@ EXTRAS_REQUIRE = {
         'google-api-python-client',
         'google-cloud-storage',
         'google-cloud-pubsub',
+    ],
+    # faster base64 and JSON handling for checkplots and the checkplotserver
+    'speedups':[
+        'pybase64',
+        'orjson',
     ]
 }
 
@@ -32,17 +32,24 @@ $ python setup.py test
 from __future__ import print_function
 import os
 import os.path
+import stat
+import gzip
+import pickle
 try:
     from urllib import urlretrieve
 except Exception:
     from urllib.request import urlretrieve
 from numpy.testing import assert_allclose, assert_almost_equal, assert_equal
 import numpy as np
+import pytest
 
 from astrobase.hatsurveys import hatlc
 from astrobase import periodbase, checkplot
 from astrobase.checkplot.pkl import checkplot_pickle_update
-from astrobase.checkplot.pkl_io import _read_checkplot_picklefile
+from astrobase.checkplot.pkl_io import (
+    _read_checkplot_picklefile,
+    _write_checkplot_picklefile,
+)
 
 ############
 ## CONFIG ##
@@ -999,3 +1006,103 @@ def test_checkplot_pickle_missing_objectinfo():
     assert_almost_equal(cpd['objectinfo']['gl'], expected_gl)
 
     assert cpd['finderchart'] is not None
+
+
+def test_read_checkplot_picklefile_gzip_magic(tmpdir):
+    '''This tests if a gzipped checkplot pickle is read correctly even if its
+    filename doesn't end in '.gz'.
+
+    '''
+
+    outfile = str(tmpdir.join('checkplot-test.pkl'))
+
+    with gzip.open(outfile, 'wb') as outfd:
+        pickle.dump({'objectid':'test', 'version':1}, outfd)
+
+    cpd = _read_checkplot_picklefile(outfile)
+    assert cpd == {'objectid':'test', 'version':1}
+
+
+def test_read_checkplot_picklefile_empty(tmpdir):
+    '''This tests if an empty checkplot pickle raises a ValueError.
+
+    '''
+
+    outfile = tmpdir.join('checkplot-test.pkl')
+    outfile.write_binary(b'')
+
+    with pytest.raises(ValueError):
+        _read_checkplot_picklefile(str(outfile))
+
+
+def test_write_checkplot_picklefile_replaces_existing(tmpdir):
+    '''This tests if writing over an existing checkplot pickle replaces it and
+    keeps its permissions.
+
+    '''
+
+    outfile = str(tmpdir.join('checkplot-test.pkl.gz'))
+
+    _write_checkplot_picklefile({'objectid':'test', 'version':1},
+                                outfile=outfile)
+    os.chmod(outfile, 0o640)
+
+    _write_checkplot_picklefile({'objectid':'test', 'version':2},
+                                outfile=outfile)
+
+    cpd = _read_checkplot_picklefile(outfile)
+    assert cpd['version'] == 2
+    assert stat.S_IMODE(os.stat(outfile).st_mode) == 0o640
+    assert os.listdir(str(tmpdir)) == ['checkplot-test.pkl.gz']
+
+
+def test_write_checkplot_picklefile_failure_cleanup(tmpdir):
+    '''This tests if a failed write leaves the existing checkplot pickle alone
+    and doesn't leave a temporary file behind.
+
+    '''
+
+    outfile = str(tmpdir.join('checkplot-test.pkl'))
+
+    _write_checkplot_picklefile({'objectid':'test', 'version':1},
+                                outfile=outfile)
+
+    # lambdas can't be pickled
+    with pytest.raises(Exception):
+        _write_checkplot_picklefile({'objectid':'test',
+                                     'version':2,
+                                     'func':lambda x: x},
+                                    outfile=outfile)
+
+    cpd = _read_checkplot_picklefile(outfile)
+    assert cpd['version'] == 1
+    assert os.listdir(str(tmpdir)) == ['checkplot-test.pkl']
+
+
+def test_write_checkplot_picklefile_optimize(tmpdir):
+    '''This tests if optimized checkplot pickles read back correctly.
+
+    '''
+
+    cpd = {'objectid':'test',
+           'magseries':{'times':np.linspace(0.0, 10.0, 1000),
+                        'mags':np.full(1000, 12.0)},
+           'objectinfo':{'objecttags':'a,b', 'ndet':1000},
+           'comments':'hello there'}
+
+    for outfname in ('checkplot-test.pkl', 'checkplot-test.pkl.gz'):
+
+        outfile = str(tmpdir.join(outfname))
+
+        written = _write_checkplot_picklefile(cpd,
+                                              outfile=outfile,
+                                              optimize=True)
+        assert written == os.path.abspath(outfile)
+
+        readcpd = _read_checkplot_picklefile(outfile)
+
+        assert readcpd['objectid'] == cpd['objectid']
+        assert readcpd['objectinfo'] == cpd['objectinfo']
+        assert readcpd['comments'] == cpd['comments']
+        assert_equal(readcpd['magseries']['times'], cpd['magseries']['times'])
+        assert_equal(readcpd['magseries']['mags'], cpd['magseries']['mags'])
@@ -0,0 +1,384 @@
+'''test_checkplotserver.py - Oct 2026
+License: MIT - see the LICENSE file for details.
+
+This tests the helpers used by the checkplotserver request handlers.
+
+'''
+
+import base64
+import json
+import os
+import os.path
+import shutil
+import tempfile
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from numpy.testing import assert_equal
+import pytest
+import tornado.web
+from tornado.testing import AsyncHTTPTestCase
+
+from astrobase.checkplot.pkl_io import (
+    _read_checkplot_picklefile,
+    _write_checkplot_picklefile,
+)
+from astrobase.cpserver.checkplotserver_handlers import (
+    CheckplotCache,
+    _safe_cpname,
+)
+from astrobase.cpserver.checkplotserver_cphandlers import (
+    CheckplotHandler,
+    CheckplotImageHandler,
+)
+
+
+###########################
+## CHECKPLOT CACHE TESTS ##
+###########################
+
+def test_cpcache_hit_and_miss():
+    '''
+    This checks that cached checkplots are returned for a matching mtime.
+
+    '''
+
+    cache = CheckplotCache(maxsize=2)
+    cpdict = {'objectid':'test-object'}
+
+    assert cache.get('cp-1.pkl', 100.0) is None
+
+    cache.put('cp-1.pkl', 100.0, cpdict)
+    assert cache.get('cp-1.pkl', 100.0) is cpdict
+
+
+def test_cpcache_mtime_change():
+    '''
+    This checks that a changed mtime is a cache miss and drops the old entry.
+
+    '''
+
+    cache = CheckplotCache(maxsize=2)
+
+    cache.put('cp-1.pkl', 100.0, {'version':1})
+    assert cache.get('cp-1.pkl', 200.0) is None
+
+    cache.put('cp-1.pkl', 200.0, {'version':2})
+    assert cache.get('cp-1.pkl', 200.0) == {'version':2}
+    assert cache.get('cp-1.pkl', 100.0) is None
+    assert len(cache._cache) == 1
+
+
+def test_cpcache_lru_eviction():
+    '''
+    This checks that the least recently used checkplot is evicted first.
+
+    '''
+
+    cache = CheckplotCache(maxsize=2)
+
+    cache.put('cp-1.pkl', 1.0, {'objectid':'1'})
+    cache.put('cp-2.pkl', 2.0, {'objectid':'2'})
+
+    # use cp-1 so that cp-2 becomes the least recently used entry
+    assert cache.get('cp-1.pkl', 1.0) is not None
+
+    cache.put('cp-3.pkl', 3.0, {'objectid':'3'})
+
+    assert cache.get('cp-2.pkl', 2.0) is None
+    assert cache.get('cp-1.pkl', 1.0) == {'objectid':'1'}
+    assert cache.get('cp-3.pkl', 3.0) == {'objectid':'3'}
+
+
+def test_cpcache_evict():
+    '''
+    This checks that evict() removes only the entries for the given checkplot.
+
+    '''
+
+    cache = CheckplotCache(maxsize=4)
+
+    cache.put('cp-1.pkl', 1.0, {'objectid':'1'})
+    cache.put('cp-2.pkl', 2.0, {'objectid':'2'})
+
+    cache.evict('cp-1.pkl')
+
+    assert cache.get('cp-1.pkl', 1.0) is None
+    assert cache.get('cp-2.pkl', 2.0) == {'objectid':'2'}
+
+    # evicting something that isn't cached is fine
+    cache.evict('cp-missing.pkl')
+
+
+def test_cpcache_disabled():
+    '''
+    This checks that nothing is cached if maxsize is 0.
+
+    '''
+
+    cache = CheckplotCache(maxsize=0)
+
+    cache.put('cp-1.pkl', 1.0, {'objectid':'1'})
+
+    assert cache.get('cp-1.pkl', 1.0) is None
+    assert len(cache._cache) == 0
+
+
+##############################
+## CHECKPLOT FILENAME TESTS ##
+##############################
+
+@pytest.mark.parametrize('cpname', [
+    'checkplot-HAT-123-0001234.pkl',
+    'checkplots/checkplot-HAT-123-0001234.pkl.gz',
+    '/data/project one/checkplot-TIC 12345678.pkl',
+    '~/checkplots/checkplot-a,b:c.pkl',
+    'checkplots/checkplot-\u00e9toile-\u2605.pkl',
+])
+def test_safe_cpname_roundtrip(cpname):
+    '''
+    This checks that any checkplot path in the list file decodes back unchanged.
+
+    '''
+
+    b64name = base64.b64encode(cpname.encode('utf-8')).decode('ascii')
+    assert _safe_cpname(b64name) == cpname
+
+
+@pytest.mark.parametrize('b64name', [
+    'not-base64!',
+    'abc',
+    base64.b64encode(b'\xff\xfe\xfd').decode('ascii'),
+])
+def test_safe_cpname_invalid(b64name):
+    '''
+    This checks that names that aren't base64 encoded UTF-8 text get a 400.
+
+    '''
+
+    with pytest.raises(tornado.web.HTTPError) as excinfo:
+        _safe_cpname(b64name)
+
+    assert excinfo.value.status_code == 400
+
+
+#############################
+## CHECKPLOT HANDLER TESTS ##
+#############################
+
+# the base64 encoding of this name has both a '/' and a '+' in it
+TEST_CPNAME = 'checkplots/checkplot-xx??>>.pkl'
+TEST_CPNAME_B64 = base64.b64encode(TEST_CPNAME.encode('utf-8')).decode('ascii')
+
+
+def _fake_png(label):
+    '''
+    This returns some bytes to stand in for a PNG in the test checkplot.
+
+    '''
+
+    return b'\x89PNG\r\n\x1a\n' + label.encode('utf-8')
+
+
+def _test_checkplot():
+    '''
+    This returns a small checkplot dict with NaNs in the places they show up.
+
+    '''
+
+    times = np.linspace(56000.0, 56010.0, 100)
+
+    cpd = {
+        'objectid':'test-object',
+        'objectinfo':{'objectid':'test-object',
+                      'ndet':100,
+                      'bmag':np.nan,
+                      'vmag':12.0},
+        'varinfo':{'objectisvar':None,
+                   'varperiod':np.nan,
+                   'varepoch':None,
+                   'features':{'stetsonj':np.nan,
+                               'skew':np.array([0.1, np.nan])}},
+        'comments':'',
+        'status':'ok',
+        'finderchart':base64.b64encode(_fake_png('finderchart')),
+        'magseries':{'plot':base64.b64encode(_fake_png('magseries')),
+                     'times':times,
+                     'mags':np.full(times.size, 12.0)},
+        'xmatch':{'testcat':{'found':True,
+                             'info':{'objectid':'xm-1',
+                                     'distarcsec':1.5,
+                                     'x':np.nan}}},
+        'neighbors':[],
+        'pfmethods':['gls'],
+        'gls':{
+            'periodogram':base64.b64encode(_fake_png('gls-periodogram')),
+            'nbestperiods':[1.0, 2.0, 3.0],
+            'bestperiod':1.0,
+        },
+    }
+
+    for pind in (0, 1, 2):
+        cpd['gls'][pind] = {
+            'plot':base64.b64encode(_fake_png('gls-phasedlc%s' % pind)),
+            'period':float(pind + 1),
+            'epoch':56000.0,
+        }
+
+    return cpd
+
+
+class CheckplotHandlerTest(AsyncHTTPTestCase):
+    '''
+    This runs the checkplot handlers against a checkplot in a temporary dir.
+
+    '''
+
+    def setUp(self):
+
+        self.cpdir = tempfile.mkdtemp()
+        self.cpfpath = os.path.join(self.cpdir, TEST_CPNAME)
+        os.makedirs(os.path.dirname(self.cpfpath))
+        _write_checkplot_picklefile(_test_checkplot(), outfile=self.cpfpath)
+
+        self.cpcache = CheckplotCache(maxsize=4)
+        self.ioexecutor = ThreadPoolExecutor(max_workers=2)
+
+        super(CheckplotHandlerTest, self).setUp()
+
+    def tearDown(self):
+
+        super(CheckplotHandlerTest, self).tearDown()
+
+        self.ioexecutor.shutdown()
+        shutil.rmtree(self.cpdir)
+
+    def get_app(self):
+
+        handlerkwargs = {'currentdir':self.cpdir,
+                         'assetpath':self.cpdir,
+                         'cplist':{'checkplots':[TEST_CPNAME]},
+                         'cplistfile':os.path.join(self.cpdir, 'cplist.json'),
+                         'executor':None,
+                         'readonly':True,
+                         'cpcache':self.cpcache,
+                         'cpdir':self.cpdir,
+                         'cpset':frozenset([TEST_CPNAME]),
+                         'ioexecutor':self.ioexecutor}
+
+        return tornado.web.Application([
+            (r'/cp/?(.*)',
+             CheckplotHandler,
+             dict(handlerkwargs, baseurl='/')),
+            (r'/img/([^/]+)/([^/]+)',
+             CheckplotImageHandler,
+             handlerkwargs),
+        ])
+
+    def _get_checkplot(self):
+        '''
+        This GETs the test checkplot's JSON from the CheckplotHandler.
+
+        '''
+
+        resp = self.fetch('/cp/%s' % TEST_CPNAME_B64.replace('/','%2F'))
+        self.assertEqual(resp.code, 200)
+
+        return json.loads(resp.body.decode('utf-8'))
+
+    def test_get_leaves_cached_checkplot_alone(self):
+        '''
+        This checks that GETs don't change the cached copy of the checkplot.
+
+        '''
+
+        for _ in range(2):
+            cpjson = self._get_checkplot()
+
+            self.assertEqual(cpjson['status'], 'ok')
+            self.assertIsNone(cpjson['result']['objectinfo']['bmag'])
+            self.assertIsNone(
+                cpjson['result']['xmatch']['testcat']['info']['x']
+            )
+
+        cpmtime = os.stat(self.cpfpath).st_mtime
+        cached = self.cpcache.get(self.cpfpath, cpmtime)
+
+        self.assertIsNotNone(cached)
+        assert_equal(cached, _read_checkplot_picklefile(self.cpfpath))
+
+    def test_get_returns_image_urls(self):
+        '''
+        This checks that the checkplot JSON has image URLs instead of base64.
+
+        '''
+
+        cpjson = self._get_checkplot()
+        result = cpjson['result']
+
+        imgurl = '/img/%s/' % quote(TEST_CPNAME_B64, safe='')
+
+        self.assertEqual(result['finderchart'], imgurl + 'finderchart')
+        self.assertEqual(result['magseries'], imgurl + 'magseries')
+        self.assertEqual(result['gls']['periodogram'],
+                         imgurl + 'gls-periodogram')
+
+        for pind in (0, 1, 2):
+            self.assertEqual(result['gls']['phasedlc%s' % pind]['plot'],
+                             imgurl + 'gls-phasedlc%s' % pind)
+
+    def test_image_urls_return_pngs(self):
+        '''
+        This checks that each image URL returns the decoded PNG for its plot.
+
+        '''
+
+        result = self._get_checkplot()['result']
+
+        plots = {
+            result['finderchart']:'finderchart',
+            result['magseries']:'magseries',
+            result['gls']['periodogram']:'gls-periodogram',
+        }
+        for pind in (0, 1, 2):
+            plots[result['gls']['phasedlc%s' % pind]['plot']] = (
+                'gls-phasedlc%s' % pind
+            )
+
+        for url, label in plots.items():
+
+            resp = self.fetch(url)
+
+            self.assertEqual(resp.code, 200)
+            self.assertEqual(resp.headers['Content-Type'], 'image/png')
+            self.assertEqual(resp.body, _fake_png(label))
+
+    def test_bad_image_keys(self):
+        '''
+        This checks that keys that aren't plots in the checkplot get a 404.
+
+        '''
+
+        imgurl = '/img/%s/' % TEST_CPNAME_B64.replace('/','%2F')
+
+        for plotkey in ('objectinfo',
+                        'gls-phasedlc9',
+                        'gls-phasedlcx',
+                        'gls-objectinfo',
+                        'varinfo-periodogram',
+                        'bls-periodogram'):
+
+            resp = self.fetch(imgurl + plotkey)
+            self.assertEqual(resp.code, 404, msg=plotkey)
+
+    def test_image_not_in_project(self):
+        '''
+        This checks that checkplots outside the current project get a 404.
+
+        '''
+
+        b64name = base64.b64encode(b'checkplot-other.pkl').decode('ascii')
+
+        resp = self.fetch('/img/%s/finderchart' % b64name)
+        self.assertEqual(resp.code, 404)